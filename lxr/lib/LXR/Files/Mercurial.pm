@@ -57,6 +57,7 @@ sub new {
 	$cmd =~ m/(.*)/;
 	$self->{'hg-cmd'} = $1;	# Untaint string
 	$self->{'path'} = $config->{'hgpath'};
+	$self->{'fsize-release'} = '';
 
 	return $self;
 }
@@ -232,18 +233,44 @@ sub getline {
 }
 
 #	getfilesize returns the file size.
+#	Sizes are listed by hg fsize, one call per directory for its
+#	own files, or one call per release for the whole tree when
+#	'hg-fsize-all' is set (as genxref does). They are cached in
+#	the object for the current release only.
 sub getfilesize {
 	my ($self, $filename, $releaseid) = @_;
 
 	$filename =~ s,^/+,,;
 	$filename =~ m/(.*)/;
 	$filename = $1;
-	my $rev = $self->filerev($filename, $releaseid);
-	$rev =~ m/(.*)/;
-	$rev = $1;
-	$ENV{'PATH'} = $self->{'path'};
-	my $fsize = `$$self{'hg-cmd'} fsize -r $rev $filename`;
-	return $fsize;
+	$releaseid =~ m/(.*)/;
+	$releaseid = $1;
+	if ($self->{'fsize-release'} ne $releaseid) {
+		$self->{'fsize-release'} = $releaseid;
+		$self->{'fsize'} = {};
+		$self->{'fsize-dirs'} = {};
+	}
+	my ($dir, $mode) = ('', '--all');
+	if (!$self->{'hg-fsize-all'}) {
+		$dir = $filename;
+		$dir =~ s,[^/]*$,,;
+		$mode = '--onelevel';
+	}
+
+	if (!exists($self->{'fsize-dirs'}{$dir})) {
+		$ENV{'PATH'} = $self->{'path'};
+		open(FSIZE, $$self{'hg-cmd'}
+					. "fsize $mode -r \"$releaseid\" \"$dir\" 2>/dev/null |")
+		or die("hg subprocess died unexpextedly: $!");
+		while (my $line = <FSIZE>) {
+			$line =~ m/^(\d+) (.*)\n/
+			and $self->{'fsize'}{$2} = $1;
+		}
+		close(FSIZE)
+		or warn "hg fsize failed for release $releaseid in /$dir\n";
+		$self->{'fsize-dirs'}{$dir} = 1;
+	}
+	return $self->{'fsize'}{$filename} // 0;
 }
 
 #	getfiletime returns the time and date the file was committed
@@ -26,9 +26,17 @@
 #	fsize returns filesize
 #		(otherwise, filesize can only be computed by checking
 #		out file and counting characters)
+#		With --all, lists "size path" for every file under the
+#		designated directory (whole tree if none) in a single
+#		pass over the manifest, instead of one hg call per file.
+#		With --onelevel, lists only the files directly in the
+#		designated directory, like ls-onelevel.
+#		A file name gives its single line; no match is an error.
 
 #------------------------------------------------
-from mercurial import cmdutil
+import zlib
+from mercurial import cmdutil, util
+from mercurial.node import nullrev
 import mercurial.hgweb.webcommands
 
 cmdtable = {}
@@ -74,14 +82,102 @@ def lxrls(ui, repo, path='', rev='.'):
 
 @command('fsize',
         [('r', 'rev', '.',
-          'return file size')],
-        'hg fsize [-r REV] [path]')
-def lxrfsize(ui, repo, path='', rev='.'):
+          'return file size'),
+         ('a', 'all', None,
+          'list sizes of all files under path'),
+         ('o', 'onelevel', None,
+          'list sizes of files directly in path')],
+        'hg fsize [-r REV] [-a|-o] [path]')
+def lxrfsize(ui, repo, path='', rev='.', **opts):
 
 	ctx = repo[rev]
+	if opts.get('all') or opts.get('onelevel'):
+		lxrfsizeall(ui, repo, ctx, path, not opts.get('onelevel'))
+		return
 	if path and path.endswith('/'):
 		ui.write('0\n')
 		return
 
 	fctx = ctx.filectx(path)
 	ui.write('%d\n' % (fctx.size()))
+
+def lxrfsizeall(ui, repo, ctx, path, recurse):
+
+	mf = ctx.manifest()
+	if path in mf:
+		# Exact file name: report only this one
+		ui.write('%d %s\n' % (filesize(repo, path, mf[path]), path))
+		return
+	if path and not path.endswith('/'):
+		path += '/'
+	l = len(path)
+
+	#	Manifest is already sorted on path: write each line as
+	#	it comes instead of collecting the tree in memory.
+	found = False
+	for full, n in mf.iteritems():
+		f = mercurial.hgweb.webcommands.decodepath(full)
+
+		if f[:l] != path:
+			continue
+		found = True
+		if not recurse and '/' in f[l:]:
+			continue
+		ui.write('%d %s\n' % (filesize(repo, full, n), f))
+	if not found:
+		raise util.Abort('no file under %s' % (path or '/'))
+
+#	filesize returns the same size as filelog.size() (thus as
+#	fsize without --all): the revlog length minus the metadata
+#	header of copies and renames. An escape header ("\1\n\1\n"
+#	in front of content starting with "\1\n") is counted in both.
+#	The length is taken from the revlog index. Only revisions
+#	without a first parent may be copies; for those, the first
+#	bytes of the text are decompressed when the revision is a full
+#	snapshot, and the text is rebuilt only for actual copies or
+#	when the snapshot can't be peeked into.
+def filesize(repo, path, n):
+
+	fl = repo.file(path)
+	rev = fl.rev(n)
+	rl = getattr(fl, '_revlog', fl)
+	size = rl.rawsize(rev)
+	if fl.parentrevs(rev)[0] != nullrev:
+		return size
+	if getattr(fl, 'iscensored', None) and fl.iscensored(rev):
+		return 0
+	h = None
+	if rl.deltaparent(rev) == nullrev:
+		h = snapshothead(rl, rev, 4)
+	if h is not None and (not h.startswith('\1\n') or h == '\1\n\1\n'):
+		return size
+	t = fl.revision(n)
+	# Metadata keys are sorted: a copy header starts with "copy"
+	if t.startswith('\1\ncopy: '):
+		size -= t.index('\1\n', 2) + 2
+	return size
+
+#	snapshothead returns the first l bytes of full snapshot rev,
+#	decompressing no more of the stored chunk than needed, or None
+#	when the chunk can't be read (revlog API or compression engine
+#	unknown to this code).
+def snapshothead(rl, rev, l):
+
+	seg = getattr(rl, '_getsegmentforrevs', None) \
+		or getattr(rl, '_chunkraw', None)
+	if seg is None:
+		return None
+	d = seg(rev, rev)
+	if isinstance(d, tuple):
+		d = d[1]
+	d = str(d)
+	if not d:
+		return ''
+	t = d[0]
+	if t == '\0':
+		return d[:l]
+	if t == 'u':
+		return d[1:l + 1]
+	if t == 'x':
+		return zlib.decompressobj().decompress(d, l)
+	return None